@@ -1,21 +1,94 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
+import random
+from collections import defaultdict
+
 import numpy as np
 
 # This is your team name
 CREATOR = "The Wise Riders"
 
 
+def determine_base_power(base):
+    return base.mines * 10 + base.crystal/10
+
+
+def determine_power(base_powers):
+    return 100 * len(base_powers) + sum(base_powers)
+
+
+def _nearest_base_idx_python(tank_xy, base_xy):
+    """
+    For each tank in ``tank_xy``, return the index of the nearest base in
+    ``base_xy``. Both are lists of (x, y) tuples.
+    """
+    bases = range(len(base_xy))
+    return [min(bases, key=lambda j: (base_xy[j][0] - tx) ** 2 + (base_xy[j][1] - ty) ** 2)
+            for tx, ty in tank_xy]
+
+
+# Numba is optional: when it is available (CPython), compile the nearest base
+# search to machine code, otherwise (e.g. PyPy) use the plain Python version,
+# which the PyPy JIT can trace
+try:
+    from numba import njit
+except ImportError:
+    _nearest_base_idx = _nearest_base_idx_python
+else:
+    @njit(cache=True, fastmath=True)
+    def _nearest_base_idx_numba(tank_xy, base_xy):
+        T = tank_xy.shape[0]
+        B = base_xy.shape[0]
+        out = np.empty(T, np.int64)
+        for i in range(T):
+            best = 1e30
+            bi = 0
+            tx, ty = tank_xy[i, 0], tank_xy[i, 1]
+            for j in range(B):
+                dx = base_xy[j, 0] - tx
+                dy = base_xy[j, 1] - ty
+                d = dx * dx + dy * dy
+                if d < best:
+                    best = d
+                    bi = j
+            out[i] = bi
+        return out
+
+    def _nearest_base_idx(tank_xy, base_xy):
+        return _nearest_base_idx_numba(np.array(tank_xy, dtype=np.float64).reshape(-1, 2),
+                                       np.array(base_xy, dtype=np.float64).reshape(-1, 2))
+
+
 # This is the AI bot that will be instantiated for the competition
 class PlayerAi:
     def __init__(self):
         self.team = CREATOR  # Mandatory attribute
 
-        # Record the previous positions of all my vehicles
+        # Record the previous positions of all my vehicles, as (x, y) tuples
         self.previous_positions = {}
         # Record the number of tanks and ships I have at each base
-        self.ntanks = {}
-        self.nships = {}
+        self.ntanks = defaultdict(int)
+        self.nships = defaultdict(int)
+
+        # Early game build plan, in order of priority, once a base has all its
+        # mines: (need(nt, ns), vehicle kind, build method, counter to increment)
+        # where nt and ns are the number of tanks and ships of the base.
+        # The first vehicle that is needed and affordable is built.
+        max_ships_per_base = 6
+        self.early_plan = (
+            # Firstly, each base should build 2 tanks
+            (lambda nt, ns: nt < 2, "tank", "build_tank", self.ntanks),
+            # Then, each base should build ships
+            (lambda nt, ns: ns < max_ships_per_base, "ship", "build_ship", self.nships),
+            # Then, each base should build a tank if it has less than 5 tanks
+            (lambda nt, ns: nt < 5 and ns >= max_ships_per_base, "tank", "build_tank", self.ntanks),
+            # If everything else is satisfied, build a jet
+            (lambda nt, ns: True, "jet", "build_jet", None),
+        )
+
+        # Call the nearest base search once, so that it is compiled now rather
+        # than during the first game tick
+        _nearest_base_idx([(0.0, 0.0)], [(0.0, 0.0)])
 
     def run(self, t: float, dt: float, info: dict, game_map: np.ndarray):
         """
@@ -54,128 +127,118 @@ class PlayerAi:
             self.strategy_lategame(info=info)
             
         myinfo = info[self.team]
-        # Try to find an enemy target
+        # Gather the bases of each enemy team once, they are used both for
+        # targeting the jets and the tanks
+        enemies = {name: team.get('bases', ()) for name, team in info.items() if name != self.team}
+
+        # The jets target the strongest base of the strongest enemy team
         target = None
-        # If there are multiple teams in the info, find the first team that is not mine
-        if len(info) > 1:
-            for name in info:
-                if name != self.team:
-                    # Target only bases
-                    if "bases" in info[name]:
-                        # Simply target the first base
-                        t = info[name]["bases"][0]
-                        target = [t.x, t.y]
+        # Compute the power of each enemy base once, it is needed both for the
+        # power of its team and for picking the strongest base
+        base_powers = {name: [determine_base_power(base) for base in bases] for name, bases in enemies.items()}
+        power = {name: determine_power(powers) for name, powers in base_powers.items()}
+        if power:
+            # max() keeps the first of equal items, scan in reverse so that ties
+            # go to the last team and base, as they did with sorted()[-1]
+            strongest_enemy = max(reversed(power), key=power.get)
+            strongest_base, _ = max(zip(reversed(enemies[strongest_enemy]), reversed(base_powers[strongest_enemy])),
+                                    key=lambda base_power: base_power[1], default=(None, None))
+            if strongest_base is None:
+                target = [75, 75]
+            else:
+                target = [strongest_base.x, strongest_base.y]
 
         # Controlling my vehicles ==============================================
 
+        # All the enemy bases, they are the same for every tank
+        enemy_bases = [b for bases in enemies.values() for b in bases]
+        base_xy = [(b.x, b.y) for b in enemy_bases]
+        tank_xy = [(tank.x, tank.y) for tank in myinfo.get("tanks", ())]
+        # Index of the nearest enemy base for each tank
+        nearest = None
+        if base_xy:
+            nearest = _nearest_base_idx(tank_xy, base_xy)
+
+        # The map is indexed as [y, x]
+        map_height, map_width = game_map.shape
+
         # Iterate through all my tanks
-        if "tanks" in myinfo:
-            for tank in myinfo["tanks"]:
-                tank_target = None
-                bases = [base for name in info for base in info[name].get('bases', []) if name != self.team]
-                nearest_base = None
-                nearest_base = sorted(bases, key=lambda b: (b.x - tank.x) ** 2 + (b.y - tank.y) ** 2)
-                if nearest_base:
-                    tank_target = nearest_base[0]
-                if (tank.uid in self.previous_positions) and (not tank.stopped):
-                    # If the tank position is the same as the previous position,
-                    # set a random heading
-                    if all(tank.position == self.previous_positions[tank.uid]):
-                        tank.set_heading(np.random.random() * 360.0)
-                    # Else, if there is a target, go to the target
-                    elif tank_target is not None:
-                        try:
-                            tank.goto(*tank_target)
-                        except Exception:
-                            pass
-                # Store the previous position of this tank for the next time step
-                self.previous_positions[tank.uid] = tank.position
+        for i, tank in enumerate(myinfo.get("tanks", ())):
+            # Target the nearest enemy base, if there is one
+            tank_target = None if nearest is None else enemy_bases[nearest[i]]
+            # Read the tank attributes once
+            uid = tank.uid
+            position = tuple(tank.position)
+            previous = self.previous_positions.get(uid)
+            if (previous is not None) and (not tank.stopped):
+                # If the tank position is the same as the previous position,
+                # set a random heading
+                if position == previous:
+                    tank.set_heading(random.random() * 360.0)
+                # Else, if there is a target inside the map, go to the target
+                elif (tank_target is not None and 0 <= tank_target.x < map_width
+                      and 0 <= tank_target.y < map_height):
+                    tank.goto(tank_target.x, tank_target.y)
+            # Store the previous position of this tank for the next time step
+            self.previous_positions[uid] = position
 
         # Iterate through all my ships
-        if "ships" in myinfo:
-            for ship in myinfo["ships"]:
-                if ship.uid in self.previous_positions:
-                    # If the ship position is the same as the previous position,
-                    # convert the ship to a base if it is far from the owning base,
-                    # set a random heading otherwise
-                    if all(ship.position == self.previous_positions[ship.uid]):
-                        if ship.get_distance(ship.owner.x, ship.owner.y) > 20:
-                            ship.convert_to_base()
-                        else:
-                            ship.set_heading(np.random.random() * 360.0)
-                # Store the previous position of this ship for the next time step
-                self.previous_positions[ship.uid] = ship.position
-
-        target = None
-        # If there are multiple teams in the info, find the first team that is not mine
-        def determine_base_power(base):
-            return base.mines * 10 + base.crystal/10
-
-        def determine_power(team):
-            return 100 * len(team.get('bases', [])) + sum(determine_base_power(base) for base in team.get('bases', []))
-
-        if len(info) > 1:
-            teams = [team for name, team in info.items() if name != self.team]
-            by_power = sorted(teams, key=determine_power)
-            if by_power:
-                strongest_enemy = by_power[-1]
-                if not 'bases' in strongest_enemy:
-                    target = [75,75]
+        for ship in myinfo.get("ships", ()):
+            # Read the ship attributes once
+            uid = ship.uid
+            position = tuple(ship.position)
+            # If the ship position is the same as the previous position,
+            # convert the ship to a base if it is far from the owning base,
+            # set a random heading otherwise
+            if position == self.previous_positions.get(uid):
+                if ship.get_distance(ship.owner.x, ship.owner.y) > 20:
+                    ship.convert_to_base()
                 else:
-                    strongest_base = sorted(strongest_enemy.get('bases', []), key=determine_base_power)
-                    if not strongest_base:
-                        target = [75,75]
-                    else:
-                        strongest_base = strongest_base[-1]
-                        target = [strongest_base.x, strongest_base.y]
+                    ship.set_heading(random.random() * 360.0)
+            # Store the previous position of this ship for the next time step
+            self.previous_positions[uid] = position
 
         # Iterate through all my jets
-        if "jets" in myinfo:
-            for jet in myinfo["jets"]:
-                # Jets simply go to the target if there is one, they never get stuck
-                if target is not None:
-                    jet.goto(*target)
+        # Jets simply go to the target if there is one, they never get stuck
+        if target is not None:
+            tx, ty = target
+            for jet in myinfo.get("jets", ()):
+                jet.goto(tx, ty)
 
 
     def strategy_early(self, info):
         # Get information about my team
         myinfo = info[self.team]
-        max_ships_per_base = 6
         max_mines_per_base = 3
+
         # Controlling my bases =================================================
 
         # Iterate through all my bases (vehicles belong to bases)
-        for base in myinfo["bases"]:
-            # If this is a new base, initialize the tank & ship counters
-            if base.uid not in self.ntanks:
-                self.ntanks[base.uid] = 0
-            if base.uid not in self.nships:
-                self.nships[base.uid] = 0
-            # Firstly, each base should build a mine if it has less than 3 mines
+        for base in myinfo.get("bases", ()):
+            # Each base should build a mine if it has less than 3 mines, and
+            # wait until it can afford it before building anything else
             if base.mines < max_mines_per_base:
                 if base.crystal > base.cost("mine"):
                     base.build_mine()
-            elif base.crystal > base.cost("tank") and self.ntanks[base.uid] < 2:
-                # build_tank() returns the uid of the tank that was built
-                tank_uid = base.build_tank(heading=360 * np.random.random())
-                # Add 1 to the tank counter for this base
-                self.ntanks[base.uid] += 1
-            # Thirdly, each base should build a ship if it has less than 3 ships
-            elif base.crystal > base.cost("ship") and self.nships[base.uid] < max_ships_per_base:
-                # build_ship() returns the uid of the ship that was built
-                ship_uid = base.build_ship(heading=360 * np.random.random())
-                # Add 1 to the ship counter for this base
-                self.nships[base.uid] += 1
-            # Secondly, each base should build a tank if it has less than 5 tanks
-            elif base.crystal > base.cost("tank") and self.ntanks[base.uid] < 5 and self.nships[base.uid] >= max_ships_per_base:
-                # build_tank() returns the uid of the tank that was built
-                tank_uid = base.build_tank(heading=360 * np.random.random())
-                # Add 1 to the tank counter for this base
-                self.ntanks[base.uid] += 1
-            # If everything else is satisfied, build a jet
-            elif base.crystal > base.cost("jet"):
-                # build_jet() returns the uid of the jet that was built
-                jet_uid = base.build_jet(heading=360 * np.random.random())
+                continue
+            # Get the tank & ship counters for this base (new bases start at 0)
+            uid = base.uid
+            nt = self.ntanks[uid]
+            ns = self.nships[uid]
+            # Look up the cost of each kind at most once per base
+            costs = {}
+            for need, kind, build, counter in self.early_plan:
+                if not need(nt, ns):
+                    continue
+                cost = costs.get(kind)
+                if cost is None:
+                    cost = costs[kind] = base.cost(kind)
+                if base.crystal > cost:
+                    # build_*() returns the uid of the vehicle that was built
+                    getattr(base, build)(heading=360 * random.random())
+                    if counter is not None:
+                        counter[uid] += 1
+                    break
 
     def strategy_midgame(self, info):
             # Get information about my team
@@ -184,32 +247,30 @@ class PlayerAi:
             # Controlling my bases =================================================
 
             # Iterate through all my bases (vehicles belong to bases)
-            for base in myinfo["bases"]:
-                # If this is a new base, initialize the tank & ship counters
-                if base.uid not in self.ntanks:
-                    self.ntanks[base.uid] = 0
-                if base.uid not in self.nships:
-                    self.nships[base.uid] = 0
+            for base in myinfo.get("bases", ()):
+                # Get the tank & ship counters for this base (new bases start at 0)
+                nt = self.ntanks[base.uid]
+                ns = self.nships[base.uid]
                 # Firstly, each base should build a mine if it has less than 3 mines
                 if base.mines < 2:
                     if base.crystal > base.cost("mine"):
                         base.build_mine()
-                elif base.crystal > base.cost("tank") and self.ntanks[base.uid] < 2:
+                elif base.crystal > base.cost("tank") and nt < 2:
                     # build_tank() returns the uid of the tank that was built
-                    tank_uid = base.build_tank(heading=360 * np.random.random())
+                    tank_uid = base.build_tank(heading=360 * random.random())
                     # Add 1 to the tank counter for this base
-                    self.ntanks[base.uid] += 1
+                    self.ntanks[base.uid] = nt + 1
                 # Thirdly, each base should build a ship if it has less than 3 ships
-                elif base.crystal > base.cost("ship") and self.nships[base.uid] < 2:
+                elif base.crystal > base.cost("ship") and ns < 2:
                     # build_ship() returns the uid of the ship that was built
-                    ship_uid = base.build_ship(heading=360 * np.random.random())
+                    ship_uid = base.build_ship(heading=360 * random.random())
                     # Add 1 to the ship counter for this base
-                    self.nships[base.uid] += 1
+                    self.nships[base.uid] = ns + 1
                 # Secondly, each base should build a tank if it has less than 5 tanks
                 # If everything else is satisfied, build a jet
                 elif base.crystal > base.cost("jet"):
                     # build_jet() returns the uid of the jet that was built
-                    jet_uid = base.build_jet(heading=360 * np.random.random())
+                    jet_uid = base.build_jet(heading=360 * random.random())
 
 
 
@@ -220,14 +281,9 @@ class PlayerAi:
             # Controlling my bases =================================================
 
             # Iterate through all my bases (vehicles belong to bases)
-            for base in myinfo["bases"]:
-                # If this is a new base, initialize the tank & ship counters
-                if base.uid not in self.ntanks:
-                    self.ntanks[base.uid] = 0
-                if base.uid not in self.nships:
-                    self.nships[base.uid] = 0
+            for base in myinfo.get("bases", ()):
                 # If everything else is satisfied, build a jet
                 if base.crystal > base.cost("jet"):
                     # build_jet() returns the uid of the jet that was built
-                    jet_uid = base.build_jet(heading=360 * np.random.random())
+                    jet_uid = base.build_jet(heading=360 * random.random())
 